@@ -1,2 +1,2 @@
-from ccmixter_song_downloader.__main__ import \
+from ccmixter_song_downloader.downloader import \
     CCMixterSongDownloader
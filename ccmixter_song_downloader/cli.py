@@ -0,0 +1,177 @@
+import argparse
+import json
+import sys
+import threading
+import time
+
+from ccmixter_song_downloader.downloader import CCMixterSongDownloader
+
+
+# keys a job in the jobs file can have and their default values
+# (save_folder defaults to the --save-folder argument)
+JOB_DEFAULTS = {
+    'tags': 'classical',
+    'sort': 'date',
+    'limit': 1,
+    'reverse': False,
+    'license': 'by',
+}
+
+
+def load_jobs(jobs_file):
+    """Reads the JSON jobs file, a list of queries for download
+    Example:
+        [{"tags": "classical", "sort": "date", "license": "by", "limit": 5},
+         {"tags": "hip_hop", "limit": 10, "save_folder": "hip_hop"}]
+
+    :param jobs_file: <str> path to the JSON jobs file
+    :return: <list> of dicts, each job with missing keys set to its default
+    """
+    with open(jobs_file, 'r') as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError('{} must contain a JSON list of jobs'
+                         .format(jobs_file))
+
+    jobs = []
+    for job in data:
+        unknown = set(job) - set(JOB_DEFAULTS) - {'save_folder'}
+        if unknown:
+            raise ValueError('Unknown key(s) {} in job {}'
+                             .format(sorted(unknown), job))
+        full_job = dict(JOB_DEFAULTS)
+        full_job.update(job)
+        jobs.append(full_job)
+    return jobs
+
+
+class Progress:
+    def __init__(self, total, stream=sys.stderr):
+        """Prints a single live line of songs downloaded or already saved
+        out of total with songs/sec and MB/sec. Pass the update and skip
+        methods as CCMixterSongDownloader.progress_callback and skip_callback
+
+        :param total: <int> max amount of songs expected to be downloaded
+        :param stream: file the progress line is written to
+        """
+        self.total = total
+        self.stream = stream
+        self.songs = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.start = time.time()
+        self._lock = threading.Lock()
+
+    def update(self, file_name, size):
+        with self._lock:
+            self.songs += 1
+            self.bytes += size
+            self.stream.write('\r' + self.status())
+            self.stream.flush()
+
+    def skip(self, file_name):
+        with self._lock:
+            self.skipped += 1
+            self.stream.write('\r' + self.status())
+            self.stream.flush()
+
+    def status(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        return '{}/{} songs ({} already saved), {:.2f} MB, ' \
+            '{:.2f} songs/sec, {:.2f} MB/sec' \
+            .format(self.songs + self.skipped, self.total, self.skipped,
+                    self.bytes / 1e6, self.songs / elapsed,
+                    self.bytes / 1e6 / elapsed)
+
+    def finish(self):
+        self.stream.write('\r' + self.status() + '\n')
+        self.stream.flush()
+
+
+def format_timings(timings, total):
+    """Returns a table of the seconds spent in each phase of download
+
+    :param timings: <dict> phase name to seconds, e.g.: {'query': 0.4}
+    :param total: <float> wall clock seconds of the whole run
+    """
+    lines = ['{:<12} {:>10}'.format('phase', 'seconds')]
+    for phase, seconds in sorted(timings.items(),
+                                 key=lambda item: -item[1]):
+        lines.append('{:<12} {:>10.3f}'.format(phase, seconds))
+    lines.append('{:<12} {:>10.3f}'.format('total', total))
+    return '\n'.join(lines)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ccmixter_song_downloader',
+        description='Download songs from ccmixter.org for each query '
+                    'in a JSON jobs file')
+    parser.add_argument(
+        'jobs_file',
+        help='JSON list of jobs with keys: tags, sort, license, limit, '
+             'reverse, save_folder')
+    parser.add_argument(
+        '-o', '--save-folder', default='downloads',
+        help='folder songs are saved to for jobs without a save_folder')
+    parser.add_argument(
+        '-w', '--workers', type=int, default=4,
+        help='amount of songs downloaded at the same time')
+    parser.add_argument(
+        '-p', '--pool-size', type=int, default=10,
+        help='max amount of kept-alive HTTP connections')
+    parser.add_argument(
+        '--no-history', action='store_true',
+        help="start each query from the first song instead of after the "
+             "songs downloaded by previous runs, the history in save folders "
+             "is left unchanged")
+    parser.add_argument(
+        '--no-snapshot', action='store_true',
+        help="don't skip songs already saved in save folders")
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help="don't print live progress")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    jobs = load_jobs(args.jobs_file)
+
+    dl = CCMixterSongDownloader(pool_size=args.pool_size,
+                                use_snapshot=not args.no_snapshot)
+    progress = Progress(sum(job['limit'] for job in jobs))
+    if not args.quiet:
+        dl.progress_callback = progress.update
+        dl.skip_callback = progress.skip
+
+    failed = 0
+    try:
+        # jobs run one after another since jobs sharing a save_folder share
+        # its history and metadata files
+        for job in jobs:
+            job = dict(job)
+            save_folder = job.pop('save_folder', args.save_folder)
+            try:
+                dl.download(save_folder,
+                            skip_previous_songs=not args.no_history,
+                            workers=args.workers, **job)
+            except Exception as e:
+                failed += 1
+                if not args.quiet:
+                    progress.finish()  # end the line before the error
+                dl.log.error('Job {} saving to {} failed: {!r}'
+                             .format(job, save_folder, e))
+    finally:
+        if not args.quiet:
+            progress.finish()
+        print(format_timings(dl.timings, time.time() - progress.start))
+
+    if failed:
+        dl.log.error('{} of {} jobs failed'.format(failed, len(jobs)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,377 @@
+import json
+import time
+import collections
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+import os
+from os.path import dirname, join, abspath
+from get_media_files import GetMediaFiles
+import logging
+from logging import Formatter
+
+try:  # python 3
+    from urllib.parse import quote
+except ImportError:  # python 2
+    from urllib import quote
+
+from ccmixter_song_downloader.history_manager import History
+from ccmixter_song_downloader.naming import SongNamer
+from ccmixter_song_downloader.library import LibrarySnapshot
+from ccmixter_song_downloader.metadata import SongMetadata
+
+
+class CCMixterSongDownloader:
+    # needs: tags, sort, limit, offset, reverse, license
+    # check this for valid values http://ccmixter.org/query-api
+    URL_TEMPLATE = 'http://ccmixter.org/api/query?tags={tags}&sort={sort}&' \
+                   'limit={limit}&offset={offset}&' \
+                   'sinced=1/1/2003&ord={reverse}&lic={license}'
+    # JSON file contains metadata of each song downloaded
+    METADATA_FILE = '_ccmixter_metadata.json'
+
+    def __init__(self, pool_size=10, use_snapshot=True):
+        """Wrapper class for creating an HTTP query for ccmixter.org to
+        download songs
+        Example:
+            # get the 5 oldest classical CC-BY licensed songs
+            dl = CCMixterSongDownloader()
+            dl.download(
+                save_folder='downloads/', tags='classical', sort='date',
+                limit=5, reverse=True, license='by')
+
+            # the following query would then be generated
+            # http://ccmixter.org/api/query?tags=classical&limit=5&offset=0&sinced=1/1/2003&ord=ASC&lic=by
+            # and download 5 songs
+
+        :param pool_size: <int> max amount of kept-alive HTTP connections \n
+            per host shared by the query and song download requests
+        :param use_snapshot: <bool> if true, songs already saved in \n
+            save_folder (known from its saved LibrarySnapshot) are not \n
+            downloaded again
+        """
+        self._setup_logging()
+        # contains all metadata of each song downloaded through download method
+        # using this object instance
+        self.songs_metadata = {}
+        # one session for every request so connections get reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # total seconds spent in each phase of download, e.g.: {'query': 0.4}
+        self.timings = collections.defaultdict(float)
+        # caches file & license names and names used in each save folder
+        self.namer = SongNamer(self.METADATA_FILE)
+        # called as progress_callback(file_name, size_in_bytes) after each
+        # song is saved, can be called from multiple threads
+        self.progress_callback = None
+        # called as skip_callback(file_name) for each song not downloaded
+        # since it was already saved
+        self.skip_callback = None
+        self.use_snapshot = use_snapshot
+
+    def _setup_logging(self):
+        self.log = logging.getLogger(CCMixterSongDownloader.__name__)
+        self.log.setLevel(logging.DEBUG)
+        formatter = Formatter(
+            "[%(name)s] - %(levelname)s - %(asctime)s -\n\t%(message)s")
+
+        # stream handler
+        sh = logging.StreamHandler()  # std.err
+        sh.setLevel(logging.WARNING)
+        sh.setFormatter(formatter)
+
+        # file handler
+        fh = logging.FileHandler('ccmixter.log')
+        fh.setLevel(logging.DEBUG)
+        fh.setFormatter(formatter)
+
+        self.log.addHandler(sh)
+        self.log.addHandler(fh)
+
+    def download(self, save_folder, tags='classical', sort='date', limit=1,
+                 reverse=False, license='by', skip_previous_songs=True,
+                 workers=1):
+        """Downloads songs from ccMixter and saves them. All arguments
+        exception save_folder and skip_previous_songs are used for
+        building the query
+
+        :param save_folder: location of saved music files
+        :param tags: <str> in url, tags of songs used as a filter
+        :param sort: <str> in url, sort type used to filter songs
+        :param limit: <int> amount of songs to download before stopping
+        :param reverse: <bool> reverses the order in which the \n
+            list of songs are returned from ccmixter
+        :param license: <str> the type of matching license of songs \n
+            for query building
+        :param skip_previous_songs: <bool> if true, checks for previous \n
+            queries made and skips the amount downloaded (as offset in url \n
+            query filter). If false, the history is neither read nor \n
+            updated.
+        :param workers: <int> amount of songs downloaded at the same time. \n
+            If any song fails, the songs that were saved still get their \n
+            metadata and history recorded before the first error is raised
+        :returns: <dict> metadata of the songs just downloaded \n
+            following JSON format in the \n
+            schema of: {"artist_-_song_name.mp3": {"artist": "Johnny", ... }}\n
+            where each key is the song file name and it's value is the JSON \n
+            formatted SongMetadata
+        """
+        # location of music files downloaded
+        save_folder = os.path.abspath(save_folder)
+        self.log.info('### CCMixterSongDownloader.download begin ###')
+
+        snapshot = None
+        if self.use_snapshot:
+            with self._timed('snapshot'):
+                snapshot = LibrarySnapshot(save_folder, self.METADATA_FILE)
+
+        if not skip_previous_songs:
+            history_data = {}
+            offset = 0
+        else:
+            history_data, offset = History.get_previous_download_amount(
+                tags, sort, save_folder)
+            if offset == '':
+                offset = 0
+
+        self.log.debug('history_data = {}'.format(history_data))
+        self.log.debug('Offset for this query: {}'.format(offset))
+
+        query_url = self.URL_TEMPLATE.format(
+            tags=tags, sort=sort, limit=limit, offset=offset,
+            reverse='ASC' if reverse else 'DESC', license=license)
+        self.log.debug("Query created: {}".format(query_url))
+        with self._timed('query'):
+            response = self.session.get(query_url)
+            self.log.debug("Response to query: {}".format(response))
+            soup = BeautifulSoup(response.text, 'lxml')
+            song_tags = soup.find_all('div', attrs={'class': 'upload_info'})
+        self.log.debug('HTML song tags found: {}'.format(len(song_tags)))
+
+        # tags and direct links of each song to download
+        song_links = collections.OrderedDict()
+        # iterate over the HTML <div> tag that contains the direct link to .mp3
+        for tag in song_tags:
+            # we've found enough songs to reach the limit
+            if len(song_links) >= limit:
+                self.log.debug('Dl limit reached, songs = {}, limit = {}'
+                               .format(len(song_links), limit))
+                break
+
+            direct_link = tag['about']
+            # avoid downloading zip files
+            if direct_link.endswith(('.zip', '.zip ')):
+                self.log.debug('Zip file encountered, skipping {}'
+                               .format(direct_link))
+                continue
+            # avoid downloading the same song twice
+            if direct_link in song_links:
+                continue
+
+            song_links[direct_link] = tag
+
+        # (tag, direct_link, file_name, save_path) of each song to download
+        with self._timed('naming'):
+            file_names = self.namer.file_names(save_folder, song_links,
+                                               snapshot)
+        songs = [(tag, direct_link, file_name, join(save_folder, file_name))
+                 for (direct_link, tag), file_name
+                 in zip(song_links.items(), file_names)]
+
+        downloaded = 0  # amount of songs downloaded
+        skipped = 0  # amount of songs saved by previous runs
+        if snapshot is not None:
+            new_songs = []
+            for song_info in songs:
+                if not snapshot.has_song(song_info[2]):
+                    new_songs.append(song_info)
+                    continue
+                skipped += 1
+                if self.skip_callback is not None:
+                    self.skip_callback(song_info[2])
+            self.log.debug('Songs already saved, skipping: {}'
+                           .format(skipped))
+            songs = new_songs
+
+        # download the songs, up to workers amount at a time, recording
+        # the metadata of each song as soon as it's saved
+        errors = []
+        download_start = time.time()
+        recording = self.timings['media_info'] + self.timings['metadata']
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = {executor.submit(self._download_song, song_info):
+                       song_info for song_info in songs}
+            for future in as_completed(futures):
+                song_info = futures[future]
+                try:
+                    future.result()
+                    self._record_song(save_folder, song_info, snapshot)
+                except Exception as e:
+                    self.log.error('Failed to save {}: {!r}'
+                                   .format(song_info[1], e))
+                    errors.append(e)
+                    continue
+                downloaded += 1
+        # time spent recording songs is counted in its own phases
+        self.timings['download'] += time.time() - download_start - (
+            self.timings['media_info'] + self.timings['metadata'] - recording)
+
+        if downloaded + skipped <= 0 and not errors:
+            self.log.error('No songs found with {} query'.format(query_url))
+        elif downloaded < limit:
+            self.log.warning('Downloaded {} songs ({} already saved) when '
+                             'limit = {}'.format(downloaded, skipped, limit))
+
+        # history_data only holds what's on disk if it was read
+        if skip_previous_songs:
+            with self._timed('history'):
+                History.history_log(
+                    wdir=save_folder, log_file=History.log_file, mode='write',
+                    write_data=self._create_history_log_info(
+                        history_data, tags, sort,
+                        offset + downloaded + skipped))
+
+        if snapshot is not None:
+            with self._timed('snapshot'):
+                snapshot.save()
+
+        try:
+            new_metadata = CCMixterSongDownloader.deserialize(save_folder)
+        except (FileExistsError, FileNotFoundError):
+            # no songs found with query can cause this
+            new_metadata = {}
+
+        self.songs_metadata.update(new_metadata)
+        if errors:
+            self.log.error('{} of {} songs failed to download'
+                           .format(len(errors), len(songs)))
+            raise errors[0]
+        return new_metadata
+
+    @contextmanager
+    def _timed(self, phase):
+        """Adds the seconds spent inside the with block to self.timings"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[phase] += time.time() - start
+
+    def _download_song(self, song_info):
+        """Downloads a single song and reports it to progress_callback
+
+        :param song_info: <tuple> (tag, direct_link, file_name, save_path)
+        """
+        tag, direct_link, file_name, save_path = song_info
+        self.log.info('Saving: {} as {}'.format(direct_link, save_path))
+        CCMixterSongDownloader._direct_link_download(
+            direct_link.strip(), save_path, session=self.session)
+        if self.progress_callback is not None:
+            self.progress_callback(file_name, os.path.getsize(save_path))
+
+    def _record_song(self, save_folder, song_info, snapshot=None):
+        """Adds the metadata of a downloaded song to the metadata file
+
+        :param song_info: <tuple> (tag, direct_link, file_name, save_path)
+        :param snapshot: <LibrarySnapshot> of save_folder if used
+        """
+        tag, direct_link, file_name, save_path = song_info
+        # get length of song
+        with self._timed('media_info'):
+            files = GetMediaFiles(save_path).get_info()
+        length = files[0][1]['Audio']['duration']
+        if length:  # length is occasionally None
+            length /= 1000
+        else:
+            if length == '':
+                length = '""'
+            self.log.critical('{} HAS LENGTH OF {}'
+                              .format(save_path, length))
+
+        with self._timed('metadata'):
+            # keep info of the song
+            artist, song, link, lic, lic_url = self._parse_info_from_tag(tag)
+            metadata = SongMetadata(
+                length=length, artist=artist, name=song, link=link,
+                license_url=lic_url, license=lic, direct_link=direct_link)
+
+            # update metadata in file with new song downloaded
+            History.history_log(
+                wdir=save_folder, log_file=self.METADATA_FILE,
+                mode='update',
+                write_data=self._create_metadata_serialization_data(
+                    file_name, metadata))
+            if snapshot is not None:
+                snapshot.add_song(file_name, direct_link)
+
+    def _parse_info_from_tag(self, tag):
+        """Extracts info about the song from the HTML tag (with
+        class='upload_info')
+        Appends the download_info attr to hold the info of
+        the song in a dict
+
+        :param tag: <bs4.element.Tag> the HTML tag with \n
+        class='upload_info'
+        """
+        title_tag = tag.find('a', attrs={'property': 'dc:title'})
+        link = title_tag['href']
+        song = title_tag.text
+        artist = tag.find('a', attrs={'property': 'dc:creator'}).text
+        license_tag = tag.find('a', attrs={'class': 'lic_link'})
+        license_url = license_tag['href']
+
+        return artist, song, link, \
+            self.namer.license(license_url), license_url
+
+    @staticmethod
+    def _direct_link_download(url, full_save_path, session=None):
+        """Saves the content from a URL that points directly to media
+
+        :param url: (string) URL of the link whose content will be saved locally
+        :param full_save_path: (string) local file path (with the file name)
+        :param session: (requests.Session) used for the request if given
+        :return: 1 if url opened successfully, 0 otherwise
+        """
+        base_path = os.path.dirname(full_save_path)
+        if not os.path.isdir(base_path):
+            os.makedirs(base_path, exist_ok=True)
+
+        r = (session or requests).get(url)
+        if r.ok:
+            with open(full_save_path, 'wb') as f:
+                f.write(r.content)
+            return 1
+        else:
+            r.raise_for_status()
+            return 0
+
+    @staticmethod
+    def _create_history_log_info(previous_history, tags, sort, downloads):
+        """Info stored when downloading complete to help skip songs already
+        downloaded for future calls to download method.
+        e.g.: {'classical+hip_hop': {'date': {'downloads': 10}}}
+        """
+        previous_history.update(
+            {tags: {sort: {'downloads': downloads}}})
+        return previous_history
+
+    @staticmethod
+    def _create_metadata_serialization_data(file_name, song_metadata):
+        return {file_name: dict(song_metadata)}
+
+    @staticmethod
+    def deserialize(folder):
+        """Load JSON metadata of song(s) saved in folder
+        :param folder: <str> directory in which the CCMIXTER_METADATA \n
+            was saved to (same directory the songs were saved to)
+        """
+        folder = abspath(folder)
+        fp = join(folder, CCMixterSongDownloader.METADATA_FILE)
+        with open(fp, 'r') as f:
+            json_data = json.load(f)
+        return json_data
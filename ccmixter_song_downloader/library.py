@@ -0,0 +1,191 @@
+import json
+import os
+import time
+from os.path import abspath, join
+
+
+def load_metadata(path):
+    """Returns the parsed JSON metadata file
+
+    :param path: <str> path to the metadata file
+    :raises FileNotFoundError: if there's no file at path
+    """
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class LibrarySnapshot:
+    snapshot_file = '._ccmixter_library_snapshot.json'
+    # seconds between changes of a folder that may leave its mtime unchanged
+    # on file systems with sub-second mtimes
+    MTIME_RESOLUTION = 0.05
+    # mtimes that are all whole seconds may come from a file system that
+    # stores them in steps of up to 2 seconds (e.g.: FAT)
+    COARSE_MTIME_RESOLUTION = 2
+
+    def __init__(self, folder, metadata_file='_ccmixter_metadata.json'):
+        """State of the songs saved in folder, loaded from the snapshot
+        saved by a previous run instead of checking every file or parsing
+        the metadata file.
+        The file list is trusted while the folder's mtime is unchanged and
+        was older than its mtime resolution when the folder was listed,
+        otherwise only the file names added or removed are updated.
+        Each song is checked with a single stat when asked about
+        Example:
+            snapshot = LibrarySnapshot('downloads')
+            snapshot.has_song('stab_-_Backtrace.mp3')  # True
+            snapshot.save()
+
+        :param folder: <str> directory songs are saved to
+        :param metadata_file: <str> name of the JSON file in folder that \n
+            maps file names of songs to their metadata
+        """
+        self.folder = abspath(folder)
+        self.metadata_file = metadata_file
+        # file name -> [size, mtime in ns]
+        self.files = {}
+        # file name -> direct link, of each song in the metadata file
+        self.owners = {}
+        self.load()
+
+    def load(self):
+        """Loads the snapshot file and updates what changed since it
+        was saved
+        """
+        try:
+            with open(join(self.folder, self.snapshot_file), 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError(data)
+        except (FileNotFoundError, NotADirectoryError, ValueError):
+            data = {}
+
+        try:
+            folder_mtime = os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            self.files = {}
+            self.owners = {}
+            return
+
+        self.files = data.get('files', {})
+        # a change right after the listing could leave the mtime unchanged
+        # unless the listing was at least one mtime tick later
+        trusted = (data.get('folder_mtime') == folder_mtime and
+                   data.get('listed', 0) - folder_mtime >=
+                   data.get('resolution', self.COARSE_MTIME_RESOLUTION) * 1e9)
+        if not trusted:
+            self._update_files()
+
+        metadata_stat = None
+        if self.metadata_file in self.files:
+            metadata_stat = self._stat(self.metadata_file)
+        if metadata_stat is None:
+            self.owners = {}
+        elif metadata_stat == data.get('metadata_stat'):
+            self.owners = data.get('owners', {})
+        else:
+            self.owners = self._read_owners()
+
+    def save(self):
+        """Writes the snapshot file in folder"""
+        if not os.path.isdir(self.folder):
+            return
+        path = join(self.folder, self.snapshot_file)
+        if not os.path.exists(path):
+            # creating the file changes the mtime of folder
+            open(path, 'w').close()
+
+        while True:
+            folder_mtime = os.stat(self.folder).st_mtime_ns
+            resolution = self._mtime_resolution(folder_mtime)
+            # a change within the same mtime tick as folder_mtime would not
+            # change it, so only list the folder once that tick is over.
+            # Not worth waiting for coarse mtimes, the next load lists the
+            # folder instead
+            wait = folder_mtime / 1e9 + resolution - time.time()
+            if 0 < wait <= self.MTIME_RESOLUTION:
+                time.sleep(wait)
+            listed = time.time_ns()
+            # files created by this run that weren't added (e.g.: history)
+            self._update_files()
+            if os.stat(self.folder).st_mtime_ns == folder_mtime:
+                break
+
+        data = {
+            'folder_mtime': folder_mtime,
+            'listed': listed,
+            'resolution': resolution,
+            'files': self.files,
+            'owners': self.owners,
+            'metadata_stat': self._stat(self.metadata_file),
+        }
+        # written in place, replacing the file would change folder's mtime
+        with open(path, 'w') as f:
+            f.write(json.dumps(data))
+
+    def has_song(self, file_name):
+        """True if the song was fully saved to folder and has metadata"""
+        if file_name not in self.owners:
+            return False
+        expected = self.files.get(file_name)
+        current = self._stat(file_name)
+        if current is None:
+            self.files.pop(file_name, None)
+        if current is not None and expected == current and current[0] > 0:
+            return True
+        # missing, modified or created since the snapshot, it's only
+        # recorded again by add_song once it has been saved again
+        del self.owners[file_name]
+        return False
+
+    def add_song(self, file_name, direct_link):
+        """Records a song saved to folder along with its metadata"""
+        current = self._stat(file_name)
+        if current is not None:
+            self.files[file_name] = current
+            self.owners[file_name] = direct_link
+
+    def _mtime_resolution(self, folder_mtime):
+        """Returns the seconds mtimes of folder may be rounded to, judged by
+        whether the mtimes seen have any fraction of a second
+        """
+        mtimes = [folder_mtime] + [entry[1] for entry in self.files.values()]
+        if any(mtime % 10 ** 9 for mtime in mtimes):
+            return self.MTIME_RESOLUTION
+        return self.COARSE_MTIME_RESOLUTION
+
+    def _read_owners(self):
+        """Returns the file name -> direct link of each song in the
+        metadata file
+        """
+        try:
+            metadata = load_metadata(join(self.folder, self.metadata_file))
+        except (FileNotFoundError, ValueError):
+            return {}
+        if not isinstance(metadata, dict):
+            return {}
+        return {name: song.get('direct_link')
+                for name, song in metadata.items() if isinstance(song, dict)}
+
+    def _update_files(self):
+        """Drops names no longer in folder and stats names that are new"""
+        names = set(os.listdir(self.folder))
+        names.discard(self.snapshot_file)
+        files = {}
+        for name in names:
+            entry = self.files.get(name)
+            if entry is None:
+                entry = self._stat(name)
+            if entry is not None:
+                files[name] = entry
+        self.files = files
+
+    def _stat(self, file_name):
+        """Returns [size, mtime in ns] of the file in folder, None if
+        not found
+        """
+        try:
+            st = os.stat(join(self.folder, file_name))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return [st.st_size, st.st_mtime_ns]
@@ -0,0 +1,135 @@
+import os
+from os.path import basename, join, splitext
+
+try:  # python 3
+    from urllib.parse import unquote
+except ImportError:  # python 2
+    from urllib import unquote
+
+from ccmixter_song_downloader.general_utility import slugify
+from ccmixter_song_downloader.library import load_metadata
+
+
+class SongNamer:
+    def __init__(self, metadata_file='_ccmixter_metadata.json'):
+        """Creates the file names of songs and the license names of their
+        license URLs. Every result is cached for the lifetime of this
+        object and the names already used in each save folder are kept in
+        memory so two different links never get saved under the same name
+        Example:
+            namer = SongNamer()
+            namer.file_names('downloads', [
+                'http://ccmixter.org/content/a/a_%2D_Song.mp3',
+                'http://ccmixter.org/content/b/a_-_Song.mp3'])
+            # ['a_-_Song.mp3', 'a_-_Song_1.mp3']
+
+        :param metadata_file: <str> name of the JSON file in a save folder \n
+            that maps file names of songs to their metadata
+        """
+        self.metadata_file = metadata_file
+        # direct link -> slugified base name
+        self._slugs = {}
+        # license url -> license, e.g.: 'CC BY 3.0'
+        self._licenses = {}
+        # save folder -> {file name: direct link or None if unknown owner}
+        self._used_names = {}
+        # save folder -> {direct link: file name}
+        self._names = {}
+
+    def slug(self, direct_link):
+        """Returns the cached file name made from the URL, not accounting
+        for names already used
+        """
+        try:
+            return self._slugs[direct_link]
+        except KeyError:
+            # convert URL text elements (%2D -> '-')
+            # and make it valid file name
+            name = slugify(basename(unquote(direct_link)))
+            self._slugs[direct_link] = name
+            return name
+
+    def license(self, license_url):
+        """Returns the cached license name of url, url should look like
+        http://creativecommons.org/licenses/by/3.0/
+        """
+        try:
+            return self._licenses[license_url]
+        except KeyError:
+            # rm last "/" character, split by "/" characters
+            url = license_url[:-1].split('/')
+            number, cc_license = url[-1], url[-2]
+            lic = "CC {} {}".format(cc_license.upper(), number)
+            self._licenses[license_url] = lic
+            return lic
+
+    def file_name(self, save_folder, direct_link, snapshot=None):
+        """Returns the file name the song of direct_link is saved as in
+        save_folder. The same link always gets the same name, a name already
+        used by a different link gets a number appended, e.g.: song_1.mp3.
+        A file without metadata (e.g.: left by an interrupted run) has no
+        known owner so its name is reused and the file is overwritten
+
+        :param snapshot: <LibrarySnapshot> of save_folder, used instead of \n
+            listing save_folder and parsing its metadata file
+        """
+        save_folder = os.path.abspath(save_folder)
+        names = self._names.get(save_folder)
+        if names is None:
+            names = self._load_folder(save_folder, snapshot)
+        try:
+            return names[direct_link]
+        except KeyError:
+            pass
+
+        used = self._used_names[save_folder]
+        name = self.slug(direct_link)
+        root, ext = splitext(name)
+        count = 0
+        while name in used and used[name] is not None:
+            count += 1
+            name = '{}_{}{}'.format(root, count, ext)
+        used[name] = direct_link
+        names[direct_link] = name
+        return name
+
+    def file_names(self, save_folder, direct_links, snapshot=None):
+        """Returns the file names of each link in direct_links,
+        e.g.: every link of a page of query results
+        """
+        save_folder = os.path.abspath(save_folder)
+        return [self.file_name(save_folder, link, snapshot)
+                for link in direct_links]
+
+    def _load_folder(self, save_folder, snapshot=None):
+        """Indexes the names of the files in save_folder from snapshot or
+        with a single directory listing. Names found in the metadata file
+        keep belonging to the link they were downloaded from
+        """
+        if snapshot is not None:
+            used = {name: snapshot.owners.get(name) for name in snapshot.files}
+            return self._index_folder(save_folder, used)
+
+        try:
+            used = dict.fromkeys(os.listdir(save_folder))
+        except (FileNotFoundError, NotADirectoryError):
+            used = {}
+
+        if self.metadata_file in used:
+            try:
+                metadata = load_metadata(join(save_folder, self.metadata_file))
+            except (FileNotFoundError, ValueError):
+                metadata = {}
+            for name, song in metadata.items():
+                if name in used and isinstance(song, dict):
+                    used[name] = song.get('direct_link')
+
+        return self._index_folder(save_folder, used)
+
+    def _index_folder(self, save_folder, used):
+        """Keeps used, file name -> owner's direct link, of save_folder"""
+        names = {link: name for name, link in used.items()
+                 if link is not None}
+        self._used_names[save_folder] = used
+        self._names[save_folder] = names
+        return names
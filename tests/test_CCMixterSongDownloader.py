@@ -1,12 +1,20 @@
 from os.path import join, dirname
 import os
+import subprocess
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from ccmixter_song_downloader.__main__ import CCMixterSongDownloader
+import ccmixter_song_downloader.downloader as downloader_module
+from ccmixter_song_downloader.downloader import CCMixterSongDownloader
 from ccmixter_song_downloader.history_manager import History
 from ccmixter_song_downloader.metadata import SongMetadata
+from ccmixter_song_downloader.library import LibrarySnapshot
+from ccmixter_song_downloader import cli
+from ccmixter_song_downloader.cli import load_jobs, Progress, format_timings
 
+import io
 import json
+import pytest
+import requests
 from pprint import pprint
 
 downloads_folder = os.path.join(os.path.dirname(__file__), 'tmp_dl')
@@ -79,5 +87,215 @@ def test_metadata():
     assert(data == expected)
 
 
+def test_load_jobs(tmpdir):
+    jobs_file = tmpdir.join('jobs.json')
+    jobs_file.write(json.dumps(
+        [{'tags': 'rap', 'limit': 2}, {'save_folder': 'other'}]))
+    jobs = load_jobs(str(jobs_file))
+    assert(jobs[0] == {'tags': 'rap', 'sort': 'date', 'limit': 2,
+                       'reverse': False, 'license': 'by'})
+    assert(jobs[1]['save_folder'] == 'other')
+    assert(jobs[1]['tags'] == 'classical')
+
+
+def test_progress():
+    stream = io.StringIO()
+    progress = Progress(3, stream=stream)
+    progress.update('a.mp3', 1000000)
+    progress.update('b.mp3', 1000000)
+    progress.skip('c.mp3')
+    assert(progress.status().startswith(
+        '3/3 songs (1 already saved), 2.00 MB, '))
+    progress.finish()
+    assert(stream.getvalue().endswith('\n'))
+    assert(stream.getvalue().count('\r') == 4)
+
+
+def test_format_timings():
+    lines = format_timings({'query': 0.5, 'download': 2.0}, 3).split('\n')
+    assert(lines[1].split() == ['download', '2.000'])
+    assert(lines[2].split() == ['query', '0.500'])
+    assert(lines[3].split() == ['total', '3.000'])
+
+
+def test_cli_continues_after_failed_job(tmpdir, monkeypatch, capsys):
+    jobs_run = []
+
+    class FailingDownloader:
+        def __init__(self, **kwargs):
+            self.timings = {'query': 0.1}
+            self.log = CCMixterSongDownloader().log
+            self.progress_callback = None
+
+        def download(self, save_folder, **job):
+            jobs_run.append(job['tags'])
+            if job['tags'] == 'bad':
+                raise requests.ConnectionError('no network')
+            return {}
+
+    monkeypatch.chdir(tmpdir)  # ccmixter.log
+    monkeypatch.setattr(cli, 'CCMixterSongDownloader', FailingDownloader)
+    jobs_file = tmpdir.join('jobs.json')
+    jobs_file.write(json.dumps([{'tags': 'bad'}, {'tags': 'good'}]))
+
+    assert(cli.main([str(jobs_file), '--quiet']) == 1)
+    assert(jobs_run == ['bad', 'good'])
+    assert('total' in capsys.readouterr().out)
+
+
+def test_module_exit_code(tmpdir):
+    tmpdir.join('not_a_folder').write('')
+    jobs_file = tmpdir.join('jobs.json')
+    jobs_file.write(json.dumps([{'save_folder': 'not_a_folder'}]))
+    result = subprocess.run(
+        [sys.executable, '-m', 'ccmixter_song_downloader', str(jobs_file),
+         '--quiet'],
+        cwd=str(tmpdir), stderr=subprocess.PIPE, universal_newlines=True,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    assert(result.returncode == 1)
+    assert('1 of 1 jobs failed' in result.stderr)
+    assert('RuntimeWarning' not in result.stderr)
+
+
+def test_download_without_history(tmpdir, fake_dl):
+    save_folder = str(tmpdir.join('dl'))
+    History.history_log(save_folder, History.log_file, 'write',
+                        {'rap': {'date': {'downloads': 5}}})
+    fake_dl({'http://ccmixter.org/content/a/a.mp3': b'a'}).download(
+        save_folder, tags='jazz', skip_previous_songs=False)
+    assert(History.history_log(save_folder, History.log_file, 'read') ==
+           {'rap': {'date': {'downloads': 5}}})
+
+
+SONG_TAG = '''<div class="upload_info" about="{link}">
+<a property="dc:title" href="http://ccmixter.org/files/a/1">Song</a>
+<a property="dc:creator" href="http://ccmixter.org/people/a">a</a>
+<a class="lic_link" href="http://creativecommons.org/licenses/by/3.0/">
+CC BY</a></div>'''
+
+
+class FakeResponse:
+    def __init__(self, url, content=None):
+        self.url = url
+        self.ok = content is not None
+        self.content = content or b''
+        self.text = self.content.decode()
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError('404 for {}'.format(self.url))
+
+
+class FakeSession:
+    def __init__(self, songs):
+        """Returns a query page listing each link of songs, then the
+        content of each song, or a 404 if its content is None
+        """
+        self.songs = songs
+
+    def get(self, url):
+        if url.startswith(CCMixterSongDownloader.URL_TEMPLATE[:30]):
+            page = ''.join(SONG_TAG.format(link=link) for link in self.songs)
+            return FakeResponse(url, page.encode())
+        return FakeResponse(url, self.songs[url])
+
+
+class FakeMediaFiles:
+    def __init__(self, path):
+        self.path = path
+
+    def get_info(self):
+        return [[self.path, {'Audio': {'duration': 1000}}]]
+
+
+@pytest.fixture
+def fake_dl(tmpdir, monkeypatch):
+    monkeypatch.chdir(tmpdir)  # ccmixter.log
+    monkeypatch.setattr(downloader_module, 'GetMediaFiles', FakeMediaFiles)
+
+    def make(songs):
+        dl = CCMixterSongDownloader()
+        dl.session = FakeSession(songs)
+        return dl
+    return make
+
+
+def test_download_workers(tmpdir, fake_dl):
+    songs = {'http://ccmixter.org/content/a/{}.mp3'.format(i): b'x' * i
+             for i in range(1, 4)}
+    dl = fake_dl(songs)
+    progress = []
+    dl.progress_callback = lambda name, size: progress.append((name, size))
+    data = dl.download(str(tmpdir.join('dl')), limit=3, workers=3)
+
+    assert(sorted(data) == ['1.mp3', '2.mp3', '3.mp3'])
+    assert(sorted(progress) == [('1.mp3', 1), ('2.mp3', 2), ('3.mp3', 3)])
+    assert(data['1.mp3']['license'] == 'CC BY 3.0')
+    assert(dl.timings['download'] >= 0)
+
+
+def test_download_failure_keeps_saved_songs(tmpdir, fake_dl):
+    songs = {'http://ccmixter.org/content/a/a_%2D_Song.mp3': b'a',
+             'http://ccmixter.org/content/a/missing.mp3': None,
+             'http://ccmixter.org/content/a/b.mp3': b'b'}
+    save_folder = str(tmpdir.join('dl'))
+    with pytest.raises(requests.HTTPError):
+        fake_dl(songs).download(save_folder, tags='rap', limit=3, workers=3)
+
+    data = CCMixterSongDownloader.deserialize(save_folder)
+    assert(sorted(data) == ['a_-_Song.mp3', 'b.mp3'])
+    history = History.history_log(save_folder, History.log_file, 'read')
+    assert(history['rap']['date']['downloads'] == 2)
+
+
+def test_download_again_without_metadata(tmpdir, fake_dl):
+    # song saved by a run that stopped before writing its metadata
+    save_folder = tmpdir.mkdir('dl')
+    save_folder.join('a.mp3').write('partial')
+
+    data = fake_dl({'http://ccmixter.org/content/a/a.mp3': b'song'}).download(
+        str(save_folder))
+    assert(list(data) == ['a.mp3'])
+    assert(set(os.listdir(str(save_folder))) ==
+           {History.log_file, LibrarySnapshot.snapshot_file,
+            '_ccmixter_metadata.json', 'a.mp3'})
+    assert(save_folder.join('a.mp3').read() == 'song')
+
+
+def test_download_skips_saved_songs(tmpdir, fake_dl):
+    songs = {'http://ccmixter.org/content/a/a.mp3': b'a',
+             'http://ccmixter.org/content/a/b.mp3': b'b'}
+    save_folder = str(tmpdir.join('dl'))
+    fake_dl(songs).download(save_folder, limit=2, skip_previous_songs=False)
+
+    dl = fake_dl(songs)
+    downloaded, skipped = [], []
+    dl.progress_callback = lambda name, size: downloaded.append(name)
+    dl.skip_callback = skipped.append
+    data = dl.download(save_folder, limit=2, skip_previous_songs=False)
+    assert(sorted(data) == ['a.mp3', 'b.mp3'])
+    assert(downloaded == [])
+    assert(sorted(skipped) == ['a.mp3', 'b.mp3'])
+
+
+def test_download_again_after_changed_file_fails(tmpdir, fake_dl):
+    url = 'http://ccmixter.org/content/a/a.mp3'
+    save_folder = tmpdir.join('dl')
+    fake_dl({url: b'song'}).download(str(save_folder),
+                                     skip_previous_songs=False)
+    save_folder.join('a.mp3').write('trunc')
+
+    with pytest.raises(requests.HTTPError):
+        fake_dl({url: None}).download(str(save_folder),
+                                      skip_previous_songs=False)
+
+    dl = fake_dl({url: b'song'})
+    skipped = []
+    dl.skip_callback = skipped.append
+    dl.download(str(save_folder), skip_previous_songs=False)
+    assert(skipped == [])
+    assert(save_folder.join('a.mp3').read() == 'song')
+
+
 if __name__ == '__main__':
     test_case1()
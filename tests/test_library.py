@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from ccmixter_song_downloader.library import LibrarySnapshot
+from ccmixter_song_downloader.naming import SongNamer
+
+link = 'http://ccmixter.org/content/stab/stab_%2D_Backtrace.mp3 '
+
+
+def make_library(tmpdir):
+    tmpdir.join('stab_-_Backtrace.mp3').write('song')
+    tmpdir.join('no_metadata.mp3').write('song')
+    tmpdir.join('_ccmixter_metadata.json').write(json.dumps(
+        {'stab_-_Backtrace.mp3': {'name': 'Backtrace', 'direct_link': link}}))
+
+
+def test_has_song(tmpdir):
+    make_library(tmpdir)
+    snapshot = LibrarySnapshot(str(tmpdir))
+    assert(snapshot.has_song('stab_-_Backtrace.mp3'))
+    assert(not snapshot.has_song('no_metadata.mp3'))
+    assert(not snapshot.has_song('missing.mp3'))
+
+
+def test_save_and_load(tmpdir):
+    make_library(tmpdir)
+    LibrarySnapshot(str(tmpdir)).save()
+
+    snapshot = LibrarySnapshot(str(tmpdir))
+    assert(snapshot.owners == {'stab_-_Backtrace.mp3': link})
+    assert(LibrarySnapshot.snapshot_file not in snapshot.files)
+
+    # modified in place after the snapshot was saved
+    tmpdir.join('stab_-_Backtrace.mp3').write('partial')
+    assert(not snapshot.has_song('stab_-_Backtrace.mp3'))
+
+    tmpdir.join('stab_-_Backtrace.mp3').remove()
+    assert(not LibrarySnapshot(str(tmpdir)).has_song('stab_-_Backtrace.mp3'))
+
+
+def test_has_song_same_size(tmpdir):
+    make_library(tmpdir)
+    LibrarySnapshot(str(tmpdir)).save()
+    song = tmpdir.join('stab_-_Backtrace.mp3')
+    song.write('gnos')
+    st = os.stat(str(song))
+    os.utime(str(song), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert(not LibrarySnapshot(str(tmpdir)).has_song('stab_-_Backtrace.mp3'))
+
+
+def test_trusted_snapshot(tmpdir, monkeypatch):
+    make_library(tmpdir)
+    LibrarySnapshot(str(tmpdir)).save()
+
+    def fail(*args):
+        raise AssertionError('metadata or folder read again')
+    monkeypatch.setattr(LibrarySnapshot, '_update_files', fail)
+    monkeypatch.setattr(LibrarySnapshot, '_read_owners', fail)
+    snapshot = LibrarySnapshot(str(tmpdir))
+    assert(snapshot.has_song('stab_-_Backtrace.mp3'))
+
+    # the namer takes the names in use from the snapshot
+    namer = SongNamer()
+    monkeypatch.setattr(os, 'listdir', fail)
+    links = [link, 'http://a.org/no_metadata.mp3']
+    assert(namer.file_names(str(tmpdir), links, snapshot) ==
+           ['stab_-_Backtrace.mp3', 'no_metadata.mp3'])
+    monkeypatch.undo()
+
+    # a file added afterwards changes the folder's mtime
+    tmpdir.join('new.mp3').write('song')
+    assert('new.mp3' in LibrarySnapshot(str(tmpdir)).files)
+
+
+def set_coarse_mtimes(tmpdir, mtime):
+    """Gives the folder and its files whole second mtimes like a file
+    system with 2 second mtime resolution would
+    """
+    tmpdir.join(LibrarySnapshot.snapshot_file).write('')
+    for path in tmpdir.listdir() + [tmpdir]:
+        os.utime(str(path), ns=(mtime, mtime))
+
+
+def test_coarse_mtimes_not_trusted(tmpdir):
+    make_library(tmpdir)
+    # the folder changed in the same 2 second step as the snapshot was saved
+    mtime = (int(time.time()) // 2 + 1) * 2 * 10 ** 9
+    set_coarse_mtimes(tmpdir, mtime)
+    LibrarySnapshot(str(tmpdir)).save()
+
+    # added afterwards without changing the folder's mtime
+    tmpdir.join('new.mp3').write('song')
+    os.utime(str(tmpdir), ns=(mtime, mtime))
+    assert('new.mp3' in LibrarySnapshot(str(tmpdir)).files)
+
+
+def test_coarse_mtimes_trusted(tmpdir, monkeypatch):
+    make_library(tmpdir)
+    set_coarse_mtimes(tmpdir, (int(time.time()) // 2 - 5) * 2 * 10 ** 9)
+    LibrarySnapshot(str(tmpdir)).save()
+
+    def fail(*args):
+        raise AssertionError('folder listed again')
+    monkeypatch.setattr(LibrarySnapshot, '_update_files', fail)
+    assert(LibrarySnapshot(str(tmpdir)).has_song('stab_-_Backtrace.mp3'))
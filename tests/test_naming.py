@@ -0,0 +1,46 @@
+import os
+import sys
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from ccmixter_song_downloader.naming import SongNamer
+
+link = 'http://ccmixter.org/content/stab/stab_%2D_Backtrace.mp3 '
+other_link = 'http://ccmixter.org/content/other/stab_-_Backtrace.mp3'
+
+
+def test_file_names_collision(tmpdir):
+    namer = SongNamer()
+    names = namer.file_names(str(tmpdir), [link, other_link, link])
+    assert(names == ['stab_-_Backtrace.mp3', 'stab_-_Backtrace_1.mp3',
+                     'stab_-_Backtrace.mp3'])
+
+
+def test_file_names_existing_files(tmpdir):
+    tmpdir.join('stab_-_Backtrace.mp3').write('')
+    tmpdir.join('_ccmixter_metadata.json').write(json.dumps(
+        {'stab_-_Backtrace.mp3': {'direct_link': link}}))
+    tmpdir.join('unknown.mp3').write('')
+
+    namer = SongNamer()
+    assert(namer.file_name(str(tmpdir), link) == 'stab_-_Backtrace.mp3')
+    assert(namer.file_name(str(tmpdir), other_link) ==
+           'stab_-_Backtrace_1.mp3')
+    assert(namer.file_name(str(tmpdir), 'http://a.org/unknown.mp3') ==
+           'unknown.mp3')
+
+
+def test_file_name_without_metadata(tmpdir):
+    # song saved by a run that stopped before writing its metadata
+    tmpdir.join('stab_-_Backtrace.mp3').write('partial')
+    tmpdir.join('_ccmixter_metadata.json').write('{}')
+
+    namer = SongNamer()
+    assert(namer.file_names(str(tmpdir), [link, other_link]) ==
+           ['stab_-_Backtrace.mp3', 'stab_-_Backtrace_1.mp3'])
+
+
+def test_license():
+    namer = SongNamer()
+    url = 'http://creativecommons.org/licenses/by/2.5/'
+    assert(namer.license(url) == 'CC BY 2.5')
+    assert(namer.license(url) == 'CC BY 2.5')